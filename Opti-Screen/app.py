@@ -2,12 +2,19 @@ from flask import Flask, render_template, Response, jsonify, request, redirect,
 from werkzeug.utils import secure_filename
 from core.camera import Camera
 from core.rppg import AdvancedRPPG
+from core.analytics import classify_bpm, classify_final_bpm
+import logging
 import time
 import cv2
 import numpy as np
 import os
+import queue
 import threading
 
+# Per-frame log sites stay quiet (and syscall-free) unless explicitly raised
+logging.basicConfig(level=logging.WARNING)
+log = logging.getLogger(__name__)
+
 app = Flask(__name__)
 
 # Configuration for file uploads
@@ -43,88 +50,186 @@ frame_count = 0
 start_time = time.time()
 processing_lock = threading.Lock()
 
-def generate_frames():
-    """Generator function for video streaming"""
-    global frame_count, current_metrics
-    
-    while True:
-        # Get frame and ROI data from camera
-        frame_bytes, roi_data = camera.get_frame()
-        
-        # Check if video ended
-        if frame_bytes is None:
-            # Video ended - generate final summary
-            print("[APP] Video ended, generating final summary...")
-            
-            with processing_lock:
-                final_summary = rppg_engine.get_final_summary()
-                
-                # Update metrics with final stable BPM and remark
-                current_metrics['bpm'] = final_summary['final_bpm']
-                current_metrics['remark'] = final_summary['remark']
-                current_metrics['total_readings'] = final_summary['total_readings']
-                current_metrics['status'] = 'VIDEO_ENDED'
-                
-                # Update classification based on final BPM
-                final_bpm = final_summary['final_bpm']
-                if final_bpm < 60:
-                    current_metrics['classification'] = 'BRADYCARDIA'
-                elif 60 <= final_bpm <= 100:
-                    current_metrics['classification'] = 'NORMAL'
-                else:
-                    current_metrics['classification'] = 'TACHYCARDIA'
-            
-            print(f"[APP] Final Summary: {final_summary['final_bpm']} BPM - {final_summary['remark']}")
-            break  # Stop generating frames
-        
-        with processing_lock:
-            frame_count += 1
-            current_time = time.time() - start_time
-            
-            # Add frame to rPPG processor
-            rppg_engine.add_frame(roi_data, current_time)
-            
-            # Process rPPG signal
+# Run the heavy rPPG analysis only every N frames - the 300-sample window
+# barely changes between consecutive frames, so per-frame FFTs are wasted
+PROCESS_STRIDE = 15
+
+# Multipart boundary built once instead of per frame
+MJPEG_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+
+# Consecutive no-face frames before the UI is told there is no face
+NO_FACE_STREAK = 30
+
+# Seconds the MJPEG emitter waits for a frame before declaring the
+# pipeline dead and closing the stream
+STREAM_STALL_TIMEOUT = 10.0
+
+invalid_frame_streak = 0
+
+def _process_frame(roi_data):
+    """Stage 2 of the pipeline: feed the rPPG engine and update metrics"""
+    global frame_count, current_metrics, invalid_frame_streak
+
+    if roi_data is None:
+        # No face detected - nothing to feed the engine, so skip the lock
+        # and the FFT work entirely (the common case early in a video)
+        invalid_frame_streak += 1
+        if invalid_frame_streak >= NO_FACE_STREAK:
+            current_metrics['status'] = 'NO_FACE'
+        return
+
+    invalid_frame_streak = 0
+
+    with processing_lock:
+        frame_count += 1
+        current_time = time.time() - start_time
+
+        # Add frame to rPPG processor
+        rppg_engine.add_frame(roi_data, current_time)
+
+        # Process rPPG signal at the stride cadence only
+        rppg_results = None
+        if frame_count % PROCESS_STRIDE == 0:
             rppg_results = rppg_engine.process_ppg_signal()
-            
-            if rppg_results['ready']:
-                # Update metrics directly from rPPG results
-                bpm = int(rppg_results['bpm'])
-                confidence = int(rppg_results['confidence'])
-                
-                # Determine classification based on BPM
-                if bpm < 48:
-                    classification = 'BRADYCARDIA'
-                elif bpm > 120:
-                    classification = 'TACHYCARDIA'
-                elif 60 <= bpm <= 100:
-                    classification = 'NORMAL'
-                else:
-                    classification = 'MONITOR'
-                
-                current_metrics = {
-                    'bpm': bpm,
-                    'confidence': confidence,
-                    'status': rppg_results['status'],
-                    'snr_db': rppg_results['snr_db'],
-                    'sqi': rppg_results['sqi'],
-                    'mode': 'FACE',
-                    'classification': classification,
-                    'ohi': confidence,  # Use confidence as OHI for simplicity
-                    'stability': rppg_results['sqi'],
-                    'anemia_ratio': 0,
-                    'warnings': [],
-                    'remark': ''  # Empty during processing, filled at video end
-                }
-            else:
-                current_metrics['status'] = 'CALIBRATING'
-                current_metrics['mode'] = 'FACE'
-        
-        # Yield frame for MJPEG stream
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-        
-        time.sleep(0.02)  # Cap at ~50 FPS processing
+
+        if rppg_results is not None and rppg_results['ready']:
+            # Update metrics directly from rPPG results
+            bpm = int(rppg_results['bpm'])
+            confidence = int(rppg_results['confidence'])
+
+            # Determine classification based on BPM
+            classification = classify_bpm(bpm)
+
+            # Mutate the existing metrics dict in place rather than
+            # rebuilding a 13-key dict on every processed frame
+            current_metrics.update(
+                bpm=bpm,
+                confidence=confidence,
+                status=rppg_results['status'],
+                snr_db=rppg_results['snr_db'],
+                sqi=rppg_results['sqi'],
+                mode='FACE',
+                classification=classification,
+                ohi=confidence,  # Use confidence as OHI for simplicity
+                stability=rppg_results['sqi'],
+                anemia_ratio=0,
+                warnings=[],
+                remark=''  # Empty during processing, filled at video end
+            )
+        elif rppg_results is not None:
+            # Analysis ran but isn't ready yet - keep last metrics on
+            # the skipped frames in between
+            current_metrics['status'] = 'CALIBRATING'
+            current_metrics['mode'] = 'FACE'
+
+
+def _finalize_session():
+    """Video ended - compute the final session summary"""
+    global current_metrics
+
+    log.info("Video ended, generating final summary...")
+
+    with processing_lock:
+        final_summary = rppg_engine.get_final_summary()
+
+        # Update metrics with final stable BPM and remark
+        current_metrics['bpm'] = final_summary['final_bpm']
+        current_metrics['remark'] = final_summary['remark']
+        current_metrics['total_readings'] = final_summary['total_readings']
+        current_metrics['status'] = 'VIDEO_ENDED'
+
+        # Update classification based on final BPM
+        current_metrics['classification'] = classify_final_bpm(final_summary['final_bpm'])
+
+    log.info("Final Summary: %s BPM - %s", final_summary['final_bpm'], final_summary['remark'])
+
+
+def generate_frames():
+    """
+    Generator function for video streaming
+
+    Three-stage pipeline: a reader thread decodes frames and extracts ROI
+    means, a processor thread runs the rPPG engine, and this generator
+    emits the MJPEG bytes - so decode, compute and network send overlap
+    instead of running back-to-back on one thread.
+    """
+    read_q = queue.Queue(maxsize=4)
+    write_q = queue.Queue(maxsize=4)
+    stop_event = threading.Event()
+
+    def _put(q, item):
+        """Bounded put that gives up when the pipeline is shutting down"""
+        while not stop_event.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(q):
+        """Bounded get that gives up when the pipeline is shutting down
+
+        A stage upstream can exit on shutdown without pushing the None
+        sentinel, so a bare get() would park this thread forever -
+        poll with a timeout and re-check the stop flag instead.
+        """
+        while not stop_event.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return None
+
+    def reader():
+        """Stage 1: decode frames + ROI extraction"""
+        while not stop_event.is_set():
+            frame_bytes, roi_data = camera.get_frame()
+            if frame_bytes is None:
+                # Video ended - propagate sentinel downstream
+                _put(read_q, None)
+                return
+            if not _put(read_q, (frame_bytes, roi_data)):
+                return
+
+    def processor():
+        """Stage 2: rPPG compute"""
+        while not stop_event.is_set():
+            item = _get(read_q)
+            if item is None:
+                _put(write_q, None)
+                return
+            frame_bytes, roi_data = item
+            _process_frame(roi_data)
+            if not _put(write_q, frame_bytes):
+                return
+
+    threading.Thread(target=reader, daemon=True).start()
+    threading.Thread(target=processor, daemon=True).start()
+
+    try:
+        while True:
+            # Bounded like the inner stages: if upstream dies without
+            # pushing the sentinel (e.g. the camera is swapped
+            # mid-stream), degrade to a closed stream instead of
+            # blocking this worker thread forever
+            try:
+                frame_bytes = write_q.get(timeout=STREAM_STALL_TIMEOUT)
+            except queue.Empty:
+                log.warning("Stream pipeline stalled - closing stream")
+                break
+
+            if frame_bytes is None:
+                # Video ended - generate final summary and stop streaming
+                _finalize_session()
+                break
+
+            # Yield frame for MJPEG stream - pacing comes from the decoder
+            # and the bounded queues, no artificial sleep needed
+            yield b''.join((MJPEG_HEADER, frame_bytes, b'\r\n'))
+    finally:
+        # Unblock and retire the pipeline threads when the client disconnects
+        stop_event.set()
 
 @app.route('/')
 def index():
@@ -136,7 +241,10 @@ def video_feed():
 
 @app.route('/status')
 def status():
-    return jsonify(current_metrics)
+    # Shallow copy under the lock so jsonify never sees a half-updated dict
+    with processing_lock:
+        snapshot = dict(current_metrics)
+    return jsonify(snapshot)
 
 @app.route('/toggle_mode', methods=['POST'])
 def toggle_mode():
@@ -163,7 +271,7 @@ def allowed_file(filename):
 
 @app.route('/upload', methods=['POST'])
 def upload_video():
-    global camera, rppg_engine, frame_count, start_time
+    global camera, rppg_engine, frame_count, start_time, invalid_frame_streak
     
     if 'video' not in request.files:
         return jsonify({'error': 'No video file provided'}), 400
@@ -177,11 +285,18 @@ def upload_video():
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     file.save(filepath)
     
-    # Reinitialize components
+    # Reinitialize components - retire the old camera's reader thread
+    # and capture explicitly; the thread keeps the instance alive, so
+    # rebinding the global alone would leak both
     with processing_lock:
+        camera.release()
         camera = Camera(source=filepath)
-        rppg_engine = AdvancedRPPG(fps=30, window_size=300)
+        # The camera may stride-decode file sources, so the engine must
+        # run at the delivered sample rate, not the container's
+        fps = camera.effective_fps
+        rppg_engine = AdvancedRPPG(fps=fps, window_size=int(fps * 10))
         frame_count = 0
+        invalid_frame_streak = 0
         start_time = time.time()
     
     return jsonify({
@@ -192,12 +307,14 @@ def upload_video():
 
 @app.route('/reset_camera', methods=['POST'])
 def reset_camera():
-    global camera, rppg_engine, frame_count, start_time
+    global camera, rppg_engine, frame_count, start_time, invalid_frame_streak
     
     with processing_lock:
+        camera.release()
         camera = Camera(source=None)
         rppg_engine = AdvancedRPPG(fps=30, window_size=300)
         frame_count = 0
+        invalid_frame_streak = 0
         start_time = time.time()
     
     return jsonify({'success': True, 'message': 'Reset complete'})
@@ -2,9 +2,160 @@
 Production-Grade Analytics with BPM Smoothing
 Stable, accurate vital signs calculation
 """
+import logging
 import numpy as np
+from bisect import bisect_right
 from collections import deque
 
+log = logging.getLogger(__name__)
+
+# BPM classification cut-points shared by the live app and the offline
+# analyzer - a single C-level binary search replaces chained comparisons
+# Live (integer BPM): <48 BRADY, 48-59 MONITOR, 60-100 NORMAL,
+#                     101-120 MONITOR, >120 TACHY
+BPM_THRESHOLDS = (48, 60, 101, 121)
+BPM_LABELS = ('BRADYCARDIA', 'MONITOR', 'NORMAL', 'MONITOR', 'TACHYCARDIA')
+
+# Session summary: <60 BRADY, 60-100 NORMAL, >100 TACHY
+SUMMARY_LABELS = ('BRADYCARDIA', 'NORMAL', 'TACHYCARDIA')
+
+
+def classify_bpm(bpm):
+    """Live 5-way classification for an integer BPM reading"""
+    return BPM_LABELS[bisect_right(BPM_THRESHOLDS, bpm)]
+
+
+def classify_final_bpm(bpm):
+    """3-way classification for the end-of-session summary BPM"""
+    # Both band edges are inclusive on the NORMAL side, so a branch-free
+    # tuple index is cheaper (and clearer) than a bisect here
+    return SUMMARY_LABELS[(bpm >= 60) + (bpm > 100)]
+
+try:
+    from numba import njit
+except ImportError:
+    # Numba is optional - without it the kernels run as plain Python
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+
+        def wrapper(func):
+            return func
+        return wrapper
+
+
+@njit(cache=True, fastmath=True)
+def _adv_stats(bpms):
+    """
+    Fused single-sweep statistics for calculate_advanced_metrics
+
+    Computes SDNN and RMSSD over the RR intervals derived from the BPM
+    history, plus the zero-crossing respiration estimate, without the
+    chain of temporary arrays (60000/bpms, np.diff, np.sign, ...).
+
+    Returns:
+        (sdnn, rmssd, resp_rate) tuple of floats
+    """
+    n = bpms.shape[0]
+    sdnn = 0.0
+    rmssd = 0.0
+    resp_rate = 0.0
+
+    if n > 10:
+        s = 0.0
+        s2 = 0.0
+        ds2 = 0.0
+        prev = 60000.0 / bpms[0]
+        s += prev
+        s2 += prev * prev
+        for i in range(1, n):
+            rr = 60000.0 / bpms[i]
+            s += rr
+            s2 += rr * rr
+            d = rr - prev
+            ds2 += d * d
+            prev = rr
+        mean = s / n
+        var = s2 / n - mean * mean
+        if var > 0.0:
+            sdnn = var ** 0.5
+        rmssd = (ds2 / (n - 1)) ** 0.5
+
+    if n >= 20:
+        # Zero crossings of the mean-detrended BPM series (RSA estimate)
+        m = 0.0
+        for i in range(n):
+            m += bpms[i]
+        m /= n
+
+        first = -1
+        last = -1
+        count = 0
+        prev_sign = 0.0
+        if bpms[0] - m > 0.0:
+            prev_sign = 1.0
+        elif bpms[0] - m < 0.0:
+            prev_sign = -1.0
+        for i in range(1, n):
+            sign = 0.0
+            if bpms[i] - m > 0.0:
+                sign = 1.0
+            elif bpms[i] - m < 0.0:
+                sign = -1.0
+            if sign != prev_sign:
+                if first < 0:
+                    first = i - 1
+                last = i - 1
+                count += 1
+            prev_sign = sign
+
+        if count > 1:
+            avg_period_frames = (last - first) / (count - 1) * 2.0
+            resp_rate = 60.0 / avg_period_frames
+
+    return sdnn, rmssd, resp_rate
+
+
+# Pay the JIT compile cost at import time, not on the first real frame
+try:
+    _adv_stats(np.ones(21, dtype=np.float32))
+except Exception as e:
+    log.warning("_adv_stats warm-up failed: %s", e)
+
+
+class RingBuffer:
+    """
+    Fixed-capacity float32 ring buffer backed by a preallocated array.
+    Appends are O(1) and recent-window reads are views into the backing
+    array (a copy is only made when the window wraps around).
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.empty(capacity, dtype=np.float32)
+        self.head = 0   # next write position
+        self.count = 0  # number of valid samples (<= capacity)
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value):
+        """Write one sample, overwriting the oldest when full"""
+        self.data[self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def tail_view(self, n):
+        """Return the last n samples (zero-copy unless the window wraps)"""
+        n = min(n, self.count)
+        if n == 0:
+            return self.data[:0]
+        start = self.head - n
+        if start >= 0:
+            return self.data[start:self.head]
+        return np.concatenate((self.data[start:], self.data[:self.head]))
+
 
 class BPMSmoother:
     """
@@ -20,7 +171,32 @@ class BPMSmoother:
         self.history = deque(maxlen=history_size)
         self.max_jump = max_jump
         self.current_bpm = 0.0
-        
+
+        # Running sum kept in sync with the history so the mean is O(1)
+        # scalar arithmetic instead of an np.mean call per frame
+        self._sum = 0.0
+
+        # Precomputed, normalized EMA weights per history length (plus an
+        # SNR-bonus variant with the newest reading up-weighted) so update()
+        # never rebuilds linspace arrays on the hot path
+        self._weight_table = {}
+        self._weight_table_bonus = {}
+        for n in range(1, history_size + 1):
+            w = np.linspace(0.5, 1.0, n, dtype=np.float32)
+            # Store plain Python floats so the hot loop does scalar C-double
+            # arithmetic instead of NumPy scalar dispatch
+            self._weight_table[n] = tuple(float(v) for v in w / w.sum())
+            wb = w.copy()
+            wb[-1] *= 1.5
+            self._weight_table_bonus[n] = tuple(float(v) for v in wb / wb.sum())
+
+    def _push(self, value):
+        """Append to history, keeping the running sum in sync with eviction"""
+        if len(self.history) == self.history.maxlen:
+            self._sum -= self.history[0]
+        self.history.append(value)
+        self._sum += value
+
     def update(self, new_bpm, snr=None):
         """
         Update with new BPM and return smoothed value
@@ -32,65 +208,63 @@ class BPMSmoother:
         Returns:
             Smoothed BPM (always returns valid number)
         """
-        if new_bpm is None or new_bpm <= 0:
+        # Cheap scalar guard instead of a whole-body try/except - keeps
+        # the hot path branch-predictable and stack traces meaningful
+        if new_bpm is None or not 0 < new_bpm < 300:
             return self.current_bpm
-            
-        try:
-            # Initialize if first reading
-            if self.current_bpm == 0 or len(self.history) == 0:
-                self.current_bpm = new_bpm
-                self.history.append(new_bpm)
-                return new_bpm
-            
-            # Outlier rejection
-            # We trust high SNR readings more, so relax max_jump if SNR is high
-            effective_max_jump = self.max_jump
-            if snr is not None and snr > 10.0:
-                 effective_max_jump *= 1.5
-            
-            mean_bpm = np.mean(self.history) if len(self.history) > 0 else new_bpm
-            
-            if abs(new_bpm - mean_bpm) > effective_max_jump:
-                # Check if this is a persistent trend (last 3 readings)
-                if len(self.history) >= 3:
-                    recent_avg = np.mean(list(self.history)[-3:])
-                    if abs(new_bpm - recent_avg) >= effective_max_jump:
-                        # True outlier check failed - maybe rapid HR change?
-                        # If SNR is good, accept it.
-                        if snr is not None and snr > 8.0:
-                             pass # Accept
-                        else:
-                            return self.current_bpm
-                else:
-                    # Not enough history - ignore outliers
-                    return self.current_bpm
-            
-            # Add to history
-            self.history.append(new_bpm)
-            
-            # If <3 readings, return raw value
-            if len(self.history) < 3:
-                self.current_bpm = new_bpm
-                return new_bpm
-            
-            # Apply Exponential Moving Average
-            readings = list(self.history)
-            weights = np.linspace(0.5, 1.0, len(readings))
-            
-            # Give bonus weight to latest reading if SNR is high
-            if snr is not None and snr > 12.0:
-                weights[-1] *= 1.5
-                
-            weights /= np.sum(weights)
-            
-            smoothed = np.average(readings, weights=weights)
-            self.current_bpm = smoothed
-            
-            return smoothed
-            
-        except Exception as e:
-            print(f"Warning: BPM smoothing failed: {e}")
-            return self.current_bpm if self.current_bpm > 0 else new_bpm
+
+        # Initialize if first reading
+        if self.current_bpm == 0 or len(self.history) == 0:
+            self.current_bpm = new_bpm
+            self._push(new_bpm)
+            return new_bpm
+
+        # Outlier rejection
+        # We trust high SNR readings more, so relax max_jump if SNR is high
+        effective_max_jump = self.max_jump
+        if snr is not None and snr > 10.0:
+            effective_max_jump *= 1.5
+
+        mean_bpm = self._sum / len(self.history)
+
+        if abs(new_bpm - mean_bpm) > effective_max_jump:
+            # Check if this is a persistent trend (last 3 readings)
+            if len(self.history) >= 3:
+                # Plain scalar mean of three floats - no list/ndarray
+                recent_avg = (self.history[-1] + self.history[-2] +
+                              self.history[-3]) / 3.0
+                if abs(new_bpm - recent_avg) >= effective_max_jump:
+                    # True outlier check failed - maybe rapid HR change?
+                    # If SNR is good, accept it.
+                    if snr is not None and snr > 8.0:
+                        pass  # Accept
+                    else:
+                        return self.current_bpm
+            else:
+                # Not enough history - ignore outliers
+                return self.current_bpm
+
+        # Add to history
+        self._push(new_bpm)
+
+        # If <3 readings, return raw value
+        if len(self.history) < 3:
+            self.current_bpm = new_bpm
+            return new_bpm
+
+        # Apply Exponential Moving Average with cached weights
+        # (bonus table up-weights the latest reading when SNR is high)
+        if snr is not None and snr > 12.0:
+            weights = self._weight_table_bonus[len(self.history)]
+        else:
+            weights = self._weight_table[len(self.history)]
+
+        smoothed = 0.0
+        for w, v in zip(weights, self.history):
+            smoothed += w * v
+        self.current_bpm = smoothed
+
+        return smoothed
 
 
 class Analytics:
@@ -99,13 +273,23 @@ class Analytics:
     def __init__(self, fps=None):
         self.fps = fps if fps is not None else 30
         
-        # Smoothing buffers
-        self.bpm_buffer = deque(maxlen=int(self.fps * 5))
-        self.ratio_buffer = deque(maxlen=int(self.fps * 5))
-        self.ohi_buffer = deque(maxlen=int(self.fps * 5))
+        # Smoothing buffers (preallocated rings - no per-frame allocation)
+        self.bpm_buffer = RingBuffer(int(self.fps * 5))
+        self.ohi_buffer = RingBuffer(int(self.fps * 5))
+
+        # R/G ratio EMA is recursive, so a single scalar state replaces the
+        # old ratio buffer; the counter only feeds the confidence metric
+        self._ema_ratio = None
+        self._ratio_count = 0
         
         # BPM Smoother
         self.bpm_smoother = BPMSmoother(history_size=10, max_jump=12.0)
+
+        # Running sums over the last 10 smoothed readings so the stability
+        # metric is O(1) instead of an np.std over a list copy per frame
+        self._stab_win = deque(maxlen=10)
+        self._stab_sum = 0.0
+        self._stab_sumsq = 0.0
         
         # Calibration
         self.calibration = None
@@ -124,9 +308,9 @@ class Analytics:
             self.calibration = calibration_params
             self.is_calibrated = calibration_params.get('is_calibrated', False)
             baseline = calibration_params.get('baseline_rg', 0)
-            print(f"✓ Calibration applied: baseline R/G = {baseline:.3f}")
+            log.info("Calibration applied: baseline R/G = %.3f", baseline)
         except Exception as e:
-            print(f"Warning: Calibration failed: {e}")
+            log.warning("Calibration failed: %s", e)
     
     def calculate_heart_rate_fft(self, fft_bpm, snr=None):
         """
@@ -139,85 +323,69 @@ class Analytics:
         Returns:
             dict with validated BPM (always returns valid structure)
         """
-        try:
-            # Handle None or invalid input
-            if fft_bpm is None or fft_bpm <= 0:
-                return {'bpm': 0, 'valid': False, 'confidence': 0}
-            
-            # Validate range (45-180 BPM for research grade)
-            if fft_bpm < 45 or fft_bpm > 180:
-                return {'bpm': 0, 'valid': False, 'confidence': 0}
-            
-            # Apply BPM smoother
-            smoothed_bpm = self.bpm_smoother.update(fft_bpm, snr=snr)
-            
-            # Add to buffer
-            self.bpm_buffer.append(smoothed_bpm)
-            
-            # Calculate stability
-            if len(self.bpm_buffer) >= 10:
-                recent = list(self.bpm_buffer)[-10:]
-                std_dev = np.std(recent)
-                stability = max(0, 100 - (std_dev * 10))  # Lower std = higher stability
-            else:
-                stability = 50
-            
-            # Calculate confidence
-            confidence = min(100, stability)
-            
-            return {
-                'bpm': int(smoothed_bpm),
-                'raw_bpm': int(fft_bpm),
-                'valid': True,
-                'confidence': int(confidence),
-                'stability': int(stability)
-            }
-            
-        except Exception as e:
-            print(f"Warning: Heart rate calculation failed: {e}")
+        # Explicit input guards replace the old whole-body try/except -
+        # one branch per frame instead of exception machinery setup
+        # Handle None or invalid input, and validate range
+        # (45-180 BPM for research grade)
+        if fft_bpm is None or not 45 <= fft_bpm <= 180:
             return {'bpm': 0, 'valid': False, 'confidence': 0}
+
+        # Apply BPM smoother
+        smoothed_bpm = self.bpm_smoother.update(fft_bpm, snr=snr)
+
+        # Add to buffer
+        self.bpm_buffer.append(smoothed_bpm)
+
+        # Calculate stability from running sums over the last 10 readings
+        if len(self._stab_win) == self._stab_win.maxlen:
+            old = self._stab_win[0]
+            self._stab_sum -= old
+            self._stab_sumsq -= old * old
+        self._stab_win.append(smoothed_bpm)
+        self._stab_sum += smoothed_bpm
+        self._stab_sumsq += smoothed_bpm * smoothed_bpm
+
+        n = len(self._stab_win)
+        if n >= 10:
+            mean = self._stab_sum / n
+            variance = max(0.0, self._stab_sumsq / n - mean * mean)
+            std_dev = variance ** 0.5
+            stability = max(0, 100 - (std_dev * 10))  # Lower std = higher stability
+        else:
+            stability = 50
+
+        # Calculate confidence
+        confidence = min(100, stability)
+
+        return {
+            'bpm': int(smoothed_bpm),
+            'raw_bpm': int(fft_bpm),
+            'valid': True,
+            'confidence': int(confidence),
+            'stability': int(stability)
+        }
     
     def calculate_advanced_metrics(self, bpm_history, snr):
         """
         Elite Metrics: HRV, Respiration, OHI
         """
-        # 1. HRV (RMSSD) - Needs beat-to-beat intervals
+        # 1. HRV (RMSSD/SDNN) - Needs beat-to-beat intervals
         # Approximating from BPM history variance for 30s window
         # True RMSSD requires IBI (Inter-Beat Interval)
+        # 2. Respiration Rate (Derived from BPM Modulation - RSA)
+        # Respiratory Sinus Arrhythmia causes HR to oscillate; estimated
+        # from zero crossings of the detrended BPM series (~1Hz history)
+        # Both fused into one JIT'd sweep over the history
         rmssd = 0
         sdnn = 0
-        
+        resp_rate = 0
+
         if len(bpm_history) > 10:
-            bpms = np.array(list(bpm_history))
-            # Convert BPM to RR intervals (ms)
-            rr_intervals = 60000.0 / bpms
-            
-            # SDNN
-            sdnn = np.std(rr_intervals)
-            
-            # RMSSD
-            diffs = np.diff(rr_intervals)
-            rmssd = np.sqrt(np.mean(diffs**2))
+            # float32 halves the buffer footprint; BPM needs nowhere near
+            # double precision
+            bpms = np.fromiter(bpm_history, np.float32, count=len(bpm_history))
+            sdnn, rmssd, resp_rate = _adv_stats(bpms)
 
-        # 2. Respiration Rate (Derived from BPM Modulation - RSA)
-        # Respiratory Sinus Arrhythmia causes HR to oscillate
-        resp_rate = 0
-        if len(bpm_history) >= 20: 
-             # Analyze frequency of BPM changes
-             # Simple approach: count zero crossings of BPM detrended
-             bpms = np.array(list(bpm_history))
-             bpms_detrend = bpms - np.mean(bpms)
-             zero_crossings = np.nonzero(np.diff(np.sign(bpms_detrend)))[0]
-             
-             # Calculate freq from zero crossings
-             if len(zero_crossings) > 1:
-                 avg_period_frames = (zero_crossings[-1] - zero_crossings[0]) / (len(zero_crossings)-1) * 2
-                 # frames to seconds (assuming ~1s update rate for history?)
-                 # Actually history is smoothed bpm.
-                 # Let's assume history update rate is approx 1Hz (from analytics loop)
-                 resp_freq = 1.0 / avg_period_frames
-                 resp_rate = resp_freq * 60
-        
         # 3. Optical Health Index (OHI)
         # Composite score 0-100
         # Weights: SNR (40%), Stability (30%), HRV/Perfusion (30%)
@@ -250,57 +418,56 @@ class Analytics:
         Returns:
             dict with risk assessment (always returns valid structure)
         """
-        try:
-            # Guard against invalid inputs
-            if avg_r is None or avg_g is None or avg_b is None:
-                return {'ratio': 0, 'risk': 'UNKNOWN', 'confidence': 0}
-            
-            if avg_r <= 0 or avg_g <= 0 or avg_b <= 0:
-                return {'ratio': 0, 'risk': 'UNKNOWN', 'confidence': 0}
-            
-            # Calculate R/G ratio
-            ratio = avg_r / avg_g
-            
-            # EMA smoothing
-            self.ratio_buffer.append(ratio)
-            
-            if len(self.ratio_buffer) >= 3:
-                alpha = 0.3  # EMA factor
-                smoothed_ratio = self.ratio_buffer[0]
-                for r in list(self.ratio_buffer)[1:]:
-                    smoothed_ratio = alpha * r + (1 - alpha) * smoothed_ratio
-            else:
-                smoothed_ratio = ratio
-            
-            # Risk classification with calibration
-            if self.is_calibrated and self.calibration:
-                baseline = self.calibration.get('baseline_rg', 1.2)
-                threshold_low = baseline * 0.85
-                threshold_high = baseline * 1.15
-            else:
-                threshold_low = 1.0
-                threshold_high = 1.4
-            
-            if smoothed_ratio < threshold_low:
-                risk = 'HIGH'
-            elif smoothed_ratio > threshold_high:
-                risk = 'LOW'
-            else:
-                risk = 'NORMAL'
-            
-            # Confidence based on buffer size
-            confidence = min(100, len(self.ratio_buffer) * 10)
-            
-            return {
-                'ratio': round(smoothed_ratio, 3),
-                'risk': risk,
-                'confidence': int(confidence),
-                'hemo_score': int((1.0 - abs(smoothed_ratio - 1.2)) * 100)
-            }
-            
-        except Exception as e:
-            print(f"Warning: Hemoglobin calculation failed: {e}")
+        # Guard against invalid inputs up front (no try/except needed -
+        # everything below is plain scalar arithmetic)
+        if avg_r is None or avg_g is None or avg_b is None:
+            return {'ratio': 0, 'risk': 'UNKNOWN', 'confidence': 0}
+
+        if avg_r <= 0 or avg_g <= 0 or avg_b <= 0:
             return {'ratio': 0, 'risk': 'UNKNOWN', 'confidence': 0}
+
+        # Calculate R/G ratio
+        ratio = avg_r / avg_g
+
+        # EMA smoothing - O(1) recursive update instead of replaying
+        # the whole buffer every frame
+        alpha = 0.3  # EMA factor
+        if self._ema_ratio is None:
+            self._ema_ratio = ratio
+        else:
+            self._ema_ratio = alpha * ratio + (1 - alpha) * self._ema_ratio
+        self._ratio_count += 1
+
+        if self._ratio_count >= 3:
+            smoothed_ratio = self._ema_ratio
+        else:
+            smoothed_ratio = ratio
+
+        # Risk classification with calibration
+        if self.is_calibrated and self.calibration:
+            baseline = self.calibration.get('baseline_rg', 1.2)
+            threshold_low = baseline * 0.85
+            threshold_high = baseline * 1.15
+        else:
+            threshold_low = 1.0
+            threshold_high = 1.4
+
+        if smoothed_ratio < threshold_low:
+            risk = 'HIGH'
+        elif smoothed_ratio > threshold_high:
+            risk = 'LOW'
+        else:
+            risk = 'NORMAL'
+
+        # Confidence based on buffer size
+        confidence = min(100, self._ratio_count * 10)
+
+        return {
+            'ratio': round(smoothed_ratio, 3),
+            'risk': risk,
+            'confidence': int(confidence),
+            'hemo_score': int((1.0 - abs(smoothed_ratio - 1.2)) * 100)
+        }
     
     def calculate_trust_metrics(self, frame, avg_r, avg_g, avg_b):
         """
@@ -309,36 +476,34 @@ class Analytics:
         Returns:
             dict with trust metrics (always returns valid structure)
         """
-        try:
-            if frame is None or avg_r is None:
-                return {'sqi': 0, 'motion': False, 'lighting': 'UNKNOWN', 'warnings': []}
-            
-            # Simple luminance-based SQI
-            luminance = (avg_r + avg_g + avg_b) / 3.0
-            
-            if luminance < 50:
-                sqi = 30
-                lighting = 'TOO_DARK'
-            elif luminance > 200:
-                sqi = 50
-                lighting = 'TOO_BRIGHT'
-            else:
-                sqi = 80
-                lighting = 'OK'
-            
-            warnings = []
-            if lighting != 'OK':
-                warnings.append(lighting)
-            
-            return {
-                'sqi': int(sqi),
-                'motion': False,
-                'lighting': lighting,
-                'warnings': warnings
-            }
-            
-        except Exception:
+        # All three channel means feed the luminance sum, so guard each
+        # of them explicitly instead of catching the TypeError later
+        if frame is None or avg_r is None or avg_g is None or avg_b is None:
             return {'sqi': 0, 'motion': False, 'lighting': 'UNKNOWN', 'warnings': []}
+
+        # Simple luminance-based SQI
+        luminance = (avg_r + avg_g + avg_b) / 3.0
+
+        if luminance < 50:
+            sqi = 30
+            lighting = 'TOO_DARK'
+        elif luminance > 200:
+            sqi = 50
+            lighting = 'TOO_BRIGHT'
+        else:
+            sqi = 80
+            lighting = 'OK'
+
+        warnings = []
+        if lighting != 'OK':
+            warnings.append(lighting)
+
+        return {
+            'sqi': int(sqi),
+            'motion': False,
+            'lighting': lighting,
+            'warnings': warnings
+        }
     
     def calculate_ohi(self, stability, hemo_score, sqi):
         """
@@ -347,29 +512,25 @@ class Analytics:
         Returns:
             dict with OHI (always returns valid structure)
         """
-        try:
-            # Handle None inputs
-            stability = stability if stability is not None else 0
-            hemo_score = hemo_score if hemo_score is not None else 0
-            sqi = sqi if sqi is not None else 0
-            
-            # Weighted average
-            ohi = (stability * 0.4 + hemo_score * 0.3 + sqi * 0.3)
-            
-            # Classify
-            if ohi >= 70:
-                classification = 'EXCELLENT'
-            elif ohi >= 50:
-                classification = 'GOOD'
-            elif ohi >= 30:
-                classification = 'FAIR'
-            else:
-                classification = 'POOR'
-            
-            return {
-                'ohi': int(ohi),
-                'classification': classification
-            }
-            
-        except Exception:
-            return {'ohi': 0, 'classification': 'UNKNOWN'}
+        # None coalescing is the only failure mode here - no try/except
+        stability = stability if stability is not None else 0
+        hemo_score = hemo_score if hemo_score is not None else 0
+        sqi = sqi if sqi is not None else 0
+
+        # Weighted average
+        ohi = (stability * 0.4 + hemo_score * 0.3 + sqi * 0.3)
+
+        # Classify
+        if ohi >= 70:
+            classification = 'EXCELLENT'
+        elif ohi >= 50:
+            classification = 'GOOD'
+        elif ohi >= 30:
+            classification = 'FAIR'
+        else:
+            classification = 'POOR'
+
+        return {
+            'ohi': int(ohi),
+            'classification': classification
+        }
@@ -1,4 +1,3 @@
-from collections import deque
 import numpy as np
 
 class BPMSmoother:
@@ -12,7 +11,22 @@ class BPMSmoother:
             history_size: Number of readings to keep for smoothing
             max_change: Maximum allowed jump in BPM between frames (outlier rejection)
         """
-        self.history = deque(maxlen=history_size)
+        # Preallocated ring of accepted readings - a deque of Python
+        # floats would be re-boxed into a list and an array on every
+        # update just to average at most ten scalars
+        self.history_size = history_size
+        self.history = np.empty(history_size, dtype=np.float64)
+        self._hidx = 0  # total readings ever accepted
+        # Running sum of the last three accepted readings, kept current
+        # in _append so the outlier-trend check is a scalar divide
+        self._last3_sum = 0.0
+        # Normalized recency weights for every possible fill level -
+        # the vector only depends on how many readings are held, so all
+        # history_size variants are built once up front
+        self._weights_table = [None]
+        for k in range(1, history_size + 1):
+            w = np.linspace(0.5, 1.0, k)
+            self._weights_table.append(w / w.sum())
         self.max_change = max_change
         self.current_bpm = 0.0
         
@@ -26,7 +40,7 @@ class BPMSmoother:
         # Initialize if empty
         if self.current_bpm == 0:
             self.current_bpm = new_bpm
-            self.history.append(new_bpm)
+            self._append(new_bpm)
             return new_bpm
             
         # Outlier rejection
@@ -34,8 +48,8 @@ class BPMSmoother:
         if abs(new_bpm - self.current_bpm) > self.max_change:
             # Check if this "outlier" is actually a trend (persists in recent history)
             # If the last 3 readings were also "outliers" close to this one, accept it
-            if len(self.history) >= 3:
-                recent_avg = np.mean(list(self.history)[-3:])
+            if self._hidx >= 3:
+                recent_avg = self._last3_sum / 3.0
                 if abs(new_bpm - recent_avg) < self.max_change:
                     # It's a valid state change, accept it
                     pass
@@ -46,15 +60,36 @@ class BPMSmoother:
                  return self.current_bpm
         
         # Add to history
-        self.history.append(new_bpm)
-        
+        self._append(new_bpm)
+
         # Calculate Weighted Moving Average
         # Give more weight to recent readings
-        readings = list(self.history)
-        weights = np.linspace(0.5, 1.0, len(readings))
-        weights /= np.sum(weights)
-        
-        smoothed_bpm = np.average(readings, weights=weights)
+        readings = self._recent(self.history_size)
+        weights = self._weights_table[len(readings)]
+
+        smoothed_bpm = float(np.dot(weights, readings))
         self.current_bpm = smoothed_bpm
-        
+
         return smoothed_bpm
+
+    def _append(self, bpm):
+        """Write an accepted reading into the ring"""
+        if self._hidx >= 3:
+            # The reading falling out of the 3-window is still in the
+            # ring (history_size > 3), so the sum updates in O(1)
+            self._last3_sum -= self.history[(self._hidx - 3)
+                                            % self.history_size]
+        self._last3_sum += bpm
+        self.history[self._hidx % self.history_size] = bpm
+        self._hidx += 1
+
+    def _recent(self, n):
+        """The last n accepted readings, oldest-first"""
+        count = min(self._hidx, self.history_size, n)
+        if self._hidx <= self.history_size:
+            return self.history[self._hidx - count:self._hidx]
+        pos = self._hidx % self.history_size
+        if pos >= count:
+            return self.history[pos - count:pos]
+        return np.concatenate((self.history[pos - count:],
+                               self.history[:pos]))